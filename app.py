@@ -11,24 +11,58 @@ The server will expose the following endpoints:
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from urllib3.util.retry import Retry
 import uuid
 import json
 import os
-from dotenv import load_dotenv
 import io
 from typing import List, Optional
 
-# Load environment variables
-load_dotenv()
+# Load environment variables (once per process, not on every rerun)
+@st.cache_resource(show_spinner=False)
+def _load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
+    return True
+
+_load_env()
 
 # --------- CONFIG ---------
 BASE_API_URL = os.getenv("BASE_API_URL", "http://127.0.0.1:8000")
 WORKFLOW_ENDPOINT = f"{BASE_API_URL}/api/v1/boq/workflow"
 STATE_ENDPOINT = f"{BASE_API_URL}/api/v1/boq/state"
+# (connect, read) - fail fast when the backend is unreachable, but allow long workflow runs
+WORKFLOW_TIMEOUT = (10, 300)
+# Agent metadata blocks appended after the main content, in display order
+METADATA_KEYS = ("boq_data", "visualization_data", "analysis_data", "interview_data")
 
 st.set_page_config(page_title="VIAB BOQ Orchestrator", layout="wide")
 
 # --------- BACKEND COMMUNICATION ---------
+def _build_session(max_retries) -> requests.Session:
+    """Create a pooled keep-alive HTTP session with the given retry policy."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=max_retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": "viab-streamlit/1"})
+    return session
+
+@st.cache_resource(show_spinner=False)
+def get_session() -> requests.Session:
+    """Shared HTTP session so keep-alive connections survive Streamlit reruns."""
+    # Only retry 502/503/504: connect and read failures should surface after one timeout
+    return _build_session(
+        Retry(total=3, connect=0, read=0, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_probe_session() -> requests.Session:
+    """Health-check session without retries, so a down backend is reported immediately."""
+    return _build_session(0)
+
 def send_to_workflow(msg: str, files: Optional[List] = None, user_id: str = None, session_id: str = None):
     """
     Send message and files to the workflow endpoint.
@@ -38,17 +72,27 @@ def send_to_workflow(msg: str, files: Optional[List] = None, user_id: str = None
         "session_id": session_id,
         "user_input": msg
     }
-    files_payload = []
-    if files:
-        for file in files:
-            files_payload.append(("files", (file.name, file.getvalue(), file.type)))
+    # The workflow run changes backend state, so drop the mirrored copy
+    st.session_state.pop("session_state_cache", None)
     try:
-        response = requests.post(
-            WORKFLOW_ENDPOINT,
-            data=data,
-            files=files_payload if files_payload else None,
-            timeout=300
-        )
+        if files:
+            # Stream the multipart body instead of assembling the whole request in memory
+            fields = [(key, value) for key, value in data.items() if value is not None]
+            for file in files:
+                fields.append(("files", (file.name, file, file.type)))
+            encoder = MultipartEncoder(fields=fields)
+            response = get_session().post(
+                WORKFLOW_ENDPOINT,
+                data=encoder,
+                headers={"Content-Type": encoder.content_type},
+                timeout=WORKFLOW_TIMEOUT
+            )
+        else:
+            response = get_session().post(
+                WORKFLOW_ENDPOINT,
+                data=data,
+                timeout=WORKFLOW_TIMEOUT
+            )
         response.raise_for_status()
         result = response.json()
         return format_workflow_response(result)
@@ -59,35 +103,30 @@ def send_to_workflow(msg: str, files: Optional[List] = None, user_id: str = None
 
 def format_workflow_response(result: dict) -> str:
     """Format the workflow response for display."""
-    response_parts = []
     # Show main content
-    if "content" in result:
-        response_parts.append(result["content"])
+    response_parts = [result["content"]] if "content" in result else []
     # Show agent metadata if available
-    if "boq_data" in result:
-        response_parts.append(str(result["boq_data"]))
-    if "visualization_data" in result:
-        response_parts.append(str(result["visualization_data"]))
-    if "analysis_data" in result:
-        response_parts.append(str(result["analysis_data"]))
-    if "interview_data" in result:
-        response_parts.append(str(result["interview_data"]))
+    response_parts.extend(str(result[key]) for key in METADATA_KEYS if key in result)
     return "\n\n".join(response_parts)
 
 def get_session_state():
-    """Get the last session state from backend."""
+    """Get the last session state from backend and keep a copy for later reruns."""
     try:
-        response = requests.get(STATE_ENDPOINT, timeout=10)
+        response = get_session().get(STATE_ENDPOINT, timeout=10)
         response.raise_for_status()
-        return response.json()
+        state = response.json()
     except requests.exceptions.RequestException as e:
         st.error(f"Failed to get session state: {e}")
+        st.session_state.pop("session_state_cache", None)
         return None
+    st.session_state["session_state_cache"] = state
+    return state
 
+@st.cache_data(ttl=10, show_spinner=False)
 def check_backend_health():
-    """Check if the backend API is running."""
+    """Check if the backend API is running (cached briefly so reruns don't re-ping it)."""
     try:
-        response = requests.get(f"{BASE_API_URL}/", timeout=5)
+        response = get_probe_session().get(f"{BASE_API_URL}/", timeout=2)
         response.raise_for_status()
         return True
     except requests.exceptions.RequestException:
@@ -109,8 +148,11 @@ with st.sidebar:
     st.header("Project & Controls")
 
     # User and session IDs - MOVED UP before being used
-    user_input_id = st.text_input("User ID (blank = random):", value="", key="user_id_input")
-    session_input_id = st.text_input("Session ID (blank = random):", value="", key="session_id_input")
+    # Inside a form, edits only trigger a rerun when applied
+    with st.form("controls"):
+        user_input_id = st.text_input("User ID (blank = random):", value="", key="user_id_input")
+        session_input_id = st.text_input("Session ID (blank = random):", value="", key="session_id_input")
+        st.form_submit_button("Apply")
 
     # Always generate if blank
     if user_input_id.strip():
@@ -166,11 +208,11 @@ with st.sidebar:
 
     with col2:
         if st.button("📊 Session State"):
-            state = get_session_state()
-            if state:
-                st.json(state)
-            else:
+            if not get_session_state():
                 st.error("No session state found")
+        # Keep showing the last fetched state on reruns without asking the backend again
+        if st.session_state.get("session_state_cache"):
+            st.json(st.session_state["session_state_cache"])
 
     st.markdown("---")
 